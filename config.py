@@ -18,18 +18,15 @@ load_dotenv()
 # ========== YANDEX НАСТРОЙКИ ==========
 YANDEX_API_KEY = os.getenv("YANDEX_API_KEY", "")
 YANDEX_FOLDER_ID = os.getenv("YANDEX_FOLDER_ID", "")
-
-if not YANDEX_API_KEY or not YANDEX_FOLDER_ID:
-    raise ValueError("Не установлены YANDEX_API_KEY или YANDEX_FOLDER_ID в .env файле!")
+# Наличие ключей проверяется при создании клиентов (YandexEmbedder, YandexGPT),
+# а не при импорте, чтобы модуль можно было импортировать без .env
 
 # Модели Yandex
 YANDEX_GPT_MODEL = "yandexgpt-lite"
 YANDEX_EMBED_MODEL = "text-search-doc"  # Для эмбеддингов
 
 # ========== TELEGRAM НАСТРОЙКИ ==========
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
-if not TELEGRAM_TOKEN:
-    raise ValueError("TELEGRAM_TOKEN не установлен в .env файле!")
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")  # Проверяется при запуске бота (main.py)
 
 # ========== ПРОМПТЫ ==========
 SYSTEM_PROMPT = """Ты — интеллектуальный ассистент с доступом к базе знаний.
@@ -45,12 +42,18 @@ SYSTEM_PROMPT = """Ты — интеллектуальный ассистент
 7. Будь вежливым и профессиональным
 """
 
-RAG_PROMPT_TEMPLATE = """Контекст из базы знаний:
-{context}
+def build_rag_prompt(context: str, query: str) -> str:
+    """
+    Формирует RAG-промпт из контекста базы знаний и вопроса пользователя.
+    
+    f-строка компилируется в байткод один раз и работает быстрее
+    str.format, который разбирает шаблон при каждом вызове.
+    """
+    return f"Контекст из базы знаний:\n{context}\n\nВопрос пользователя: {query}\n\nОтвет:"
 
-Вопрос пользователя: {query}
 
-Ответ:"""
+# Шаблон в формате str.format, построенный из build_rag_prompt (единый источник текста)
+RAG_PROMPT_TEMPLATE = build_rag_prompt("{context}", "{query}")
 
 # ========== ЛОГИРОВАНИЕ ==========
 LOG_LEVEL = "INFO"
@@ -61,6 +64,21 @@ BASE_DIR = Path(__file__).parent
 FAISS_INDEX_PATH = BASE_DIR / "index.faiss"
 FAISS_METADATA_PATH = BASE_DIR / "metadata.json"
 DOCS_PATH = BASE_DIR / "data" / "docs"
+EMBEDDINGS_CACHE_DIR = BASE_DIR / "embeddings_cache"
+
+# Тип индекса: точный IndexFlatIP для небольших баз,
+# приближенный IndexHNSWFlat (поиск за O(log N)) для больших
+HNSW_THRESHOLD = 10_000  # Количество документов, начиная с которого используется HNSW
+HNSW_M = 32  # Количество связей на вершину графа
+HNSW_EF_CONSTRUCTION = 200  # Точность построения графа
+HNSW_EF_SEARCH = 64  # Точность поиска
+
+# Хранить векторы в индексе в int8 (ScalarQuantizer QT_8bit): в 4 раза меньше
+# памяти и места на диске при незначительной потере точности поиска.
+# Используется только для больших баз: на малых экономия ничтожна, а
+# диапазоны квантования обучаются на слишком малом числе векторов
+INDEX_USE_SQ8 = True
+SQ8_THRESHOLD = 100_000  # Количество документов, начиная с которого включается int8
 
 # ========== RAG НАСТРОЙКИ ==========
 TOP_K_RESULTS = 3
@@ -70,3 +88,27 @@ MAX_HISTORY_LENGTH = 10
 # Таймауты для запросов
 REQUEST_TIMEOUT = 30
 
+# Повторы HTTP-запросов к Yandex Embeddings при временных ошибках (429/5xx):
+# экспоненциальная задержка со случайным разбросом, Retry-After учитывается
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_FACTOR = 0.5
+HTTP_BACKOFF_JITTER = 0.5
+
+# Повторы запросов к Yandex GPT: ответ ждет пользователь, поэтому бюджет
+# небольшой, задержки ограничены, а запрос после таймаута чтения не повторяется
+GPT_MAX_RETRIES = 2
+GPT_BACKOFF_MAX = 4  # Максимальная задержка между попытками, секунд
+GPT_RETRY_AFTER_MAX = 5  # Максимальное учитываемое значение Retry-After, секунд
+
+# Количество параллельных запросов к Yandex Embeddings при индексации
+EMBED_MAX_WORKERS = 8
+
+# Лимит длины текста для одного запроса к Yandex Embeddings. Более длинные
+# тексты разбиваются на перекрывающиеся фрагменты, эмбеддинги которых усредняются
+EMBED_MAX_TEXT_LENGTH = 10000
+EMBED_CHUNK_SIZE = 8000
+EMBED_CHUNK_OVERLAP = 1500
+
+# Размер LRU-кэша эмбеддингов пользовательских запросов
+QUERY_CACHE_SIZE = 1024
+
@@ -19,6 +19,7 @@ from aiogram.enums import ParseMode
 
 from config import TELEGRAM_TOKEN, DOCS_PATH, LOG_LEVEL, LOG_FORMAT
 from rag.pipeline import RAGPipeline
+from rag.session import ChatSession
 
 # ========== НАСТРОЙКА ЛОГИРОВАНИЯ ==========
 logging.basicConfig(
@@ -32,6 +33,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # ========== ИНИЦИАЛИЗАЦИЯ БОТА ==========
+if not TELEGRAM_TOKEN:
+    raise ValueError("TELEGRAM_TOKEN не установлен в .env файле!")
+
 bot = Bot(token=TELEGRAM_TOKEN)
 dp = Dispatcher()
 
@@ -41,10 +45,10 @@ rag_pipeline = RAGPipeline()
 logger.info("RAG Pipeline готов к работе")
 
 # ========== ПАМЯТЬ РАЗГОВОРОВ ==========
-# Словарь для хранения истории сообщений каждого пользователя
-# Структура: {user_id: [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}]}
+# Словарь с сессиями диалога каждого пользователя
+# Структура: {user_id: ChatSession} - сессия сама хранит последние
+# MAX_HISTORY_LENGTH пар вопрос-ответ (см. config.py)
 conversation_history = {}
-MAX_HISTORY_LENGTH = 10  # Максимум последних сообщений для контекста
 
 
 # ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==========
@@ -363,7 +367,8 @@ async def cmd_stats(message: Message):
     status_text = "Загружена" if stats['is_loaded'] else "Не загружена"
     
     # Статистика истории для пользователя
-    history_count = len(conversation_history.get(user_id, [])) // 2  # Делим на 2 (пары вопрос-ответ)
+    session = conversation_history.get(user_id)
+    history_count = len(session) // 2 if session else 0  # Делим на 2 (пары вопрос-ответ)
     
     stats_text = f"""
 📊 <b>Статистика RAG-системы</b>
@@ -402,7 +407,7 @@ async def cmd_clear(message: Message):
     
     if user_id in conversation_history:
         messages_count = len(conversation_history[user_id]) // 2
-        conversation_history[user_id] = []
+        conversation_history[user_id].clear()
         await message.answer(
             f"🧹 <b>История очищена!</b>\n\n"
             f"Удалено {messages_count} сообщений из контекста.\n"
@@ -487,22 +492,13 @@ async def handle_text(message: Message):
     processing_msg = await message.answer("🔍 Ищу информацию...")
     
     try:
-        # Инициализируем историю для нового пользователя
+        # Инициализируем сессию для нового пользователя
         if user_id not in conversation_history:
-            conversation_history[user_id] = []
-        
-        # Выполняем RAG-запрос с историей
-        result = rag_pipeline.query_with_history(query, conversation_history[user_id])
-        
-        # Сохраняем в историю ЧИСТЫЕ вопросы и ответы (без RAG промптов)
-        conversation_history[user_id].append({"role": "user", "content": query})
-        conversation_history[user_id].append({"role": "assistant", "content": result['answer']})
+            conversation_history[user_id] = ChatSession()
         
-        # Ограничиваем размер истории
-        if len(conversation_history[user_id]) > MAX_HISTORY_LENGTH * 2:
-            # Оставляем только последние MAX_HISTORY_LENGTH пар (вопрос-ответ)
-            conversation_history[user_id] = conversation_history[user_id][-(MAX_HISTORY_LENGTH * 2):]
-            logger.info(f"История обрезана до {MAX_HISTORY_LENGTH} пар сообщений")
+        # Выполняем RAG-запрос в сессии: пайплайн сам добавит в историю
+        # ЧИСТЫЕ вопрос и ответ (без RAG промптов), старые сообщения вытесняются
+        result = rag_pipeline.query_in_session(conversation_history[user_id], query)
         
         # Формируем ответ БЕЗ источников
         response_text = result['answer']
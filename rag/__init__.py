@@ -6,21 +6,28 @@ RAG (Retrieval-Augmented Generation) пакет для Telegram-бота (Yandex
 - Retriever: извлечение релевантных документов
 - Pipeline: координация всех компонентов
 - YandexGPT: генерация ответов через Yandex GPT
+- ChatSession: история диалога пользователя
 """
 
 __version__ = "2.0.0"
 __author__ = "RAG Bot Team (Yandex Edition)"
 
-from .yandex_embedder import YandexEmbedder
+from .yandex_embedder import YandexEmbedder, get_embedder
 from .vectorstore import FAISSVectorStore
 from .retriever import DocumentRetriever
 from .pipeline import RAGPipeline
-from .yandex_gpt import YandexGPT
+from .yandex_gpt import YandexGPT, get_llm
+from .yandex_http import YandexAPIError
+from .session import ChatSession
 
 __all__ = [
     "YandexEmbedder",
     "FAISSVectorStore",
     "DocumentRetriever",
     "RAGPipeline",
-    "YandexGPT"
+    "YandexGPT",
+    "get_embedder",
+    "get_llm",
+    "YandexAPIError",
+    "ChatSession"
 ]
@@ -4,14 +4,16 @@
 
 import logging
 from typing import Dict, List, Optional
-from rag.yandex_embedder import YandexEmbedder
+import numpy as np
+from rag.yandex_embedder import get_embedder
 from rag.vectorstore import FAISSVectorStore
 from rag.retriever import DocumentRetriever
-from rag.yandex_gpt import YandexGPT
+from rag.yandex_gpt import get_llm
+from rag.session import ChatSession
 from config import (
     YANDEX_GPT_MODEL,
     SYSTEM_PROMPT,
-    RAG_PROMPT_TEMPLATE,
+    build_rag_prompt,
     TOP_K_RESULTS,
     MAX_CONTEXT_LENGTH,
 )
@@ -35,11 +37,15 @@ class RAGPipeline:
         """
         logger.info("Инициализация RAG Pipeline (Yandex версия)...")
         
-        # Инициализируем компоненты RAG
-        self.embedder = YandexEmbedder()
+        # Инициализируем компоненты RAG (клиенты Yandex общие для всех пайплайнов)
+        self.embedder = get_embedder()
         self.vectorstore = FAISSVectorStore()
         self.retriever = DocumentRetriever(self.embedder, self.vectorstore)
-        self.llm = YandexGPT()
+        self.llm = get_llm()
+        
+        # Yandex GPT не поддерживает системную роль, поэтому системный промпт
+        # один раз превращаем в преамбулу пользовательского сообщения
+        self._system_preamble = f"Системная инструкция: {SYSTEM_PROMPT}\n\n"
         
         # Пытаемся загрузить существующий индекс
         self.is_loaded = self.vectorstore.load()
@@ -61,24 +67,43 @@ class RAGPipeline:
         Returns:
             Словарь с ответом и метаданными
         """
-        return self.query_with_history(query, history=[], top_k=top_k)
+        return self.query_in_session(ChatSession(), query, top_k=top_k)
     
     def query_with_history(self, query: str, history: List[Dict] = None, 
                           top_k: int = TOP_K_RESULTS) -> Dict[str, any]:
         """
         Выполняет RAG-запрос с учетом истории диалога.
         
+        Для многократных запросов в одном диалоге удобнее query_in_session:
+        она не преобразует историю заново на каждом запросе.
+        
         Args:
             query: Текстовый запрос пользователя
-            history: История предыдущих сообщений
+            history: История предыдущих сообщений [{"role": ..., "content": ...}]
             top_k: Количество документов для извлечения
             
         Returns:
             Словарь с ответом и метаданными
         """
-        if history is None:
-            history = []
+        session = ChatSession.from_messages(history or [])
+        return self.query_in_session(session, query, top_k=top_k)
+    
+    def query_in_session(self, session: ChatSession, query: str,
+                         top_k: int = TOP_K_RESULTS) -> Dict[str, any]:
+        """
+        Выполняет RAG-запрос в рамках диалога пользователя.
+        
+        История берется из сессии как есть (уже в формате Yandex API),
+        а после успешного ответа в нее добавляется пара вопрос-ответ.
         
+        Args:
+            session: Сессия диалога пользователя
+            query: Текстовый запрос пользователя
+            top_k: Количество документов для извлечения
+            
+        Returns:
+            Словарь с ответом и метаданными
+        """
         # Проверяем загружен ли индекс
         if not self.is_loaded:
             logger.error("Индекс не загружен, невозможно выполнить запрос")
@@ -91,47 +116,38 @@ class RAGPipeline:
             }
         
         try:
-            # Шаг 1: Извлекаем релевантный контекст
-            context = self.retriever.retrieve_context(
+            # Шаг 1-2: Извлекаем контекст и источники за один поиск
+            context, sources = self.retriever.retrieve_with_sources(
                 query, 
                 top_k=top_k,
                 max_length=MAX_CONTEXT_LENGTH
             )
             
-            # Шаг 2: Получаем источники
-            sources = self.retriever.get_relevant_sources(query, top_k)
-            
-            # Шаг 3: Формируем промпт с контекстом
-            prompt_with_context = RAG_PROMPT_TEMPLATE.format(
-                context=context,
-                query=query
-            )
-            
-            # Шаг 4: Формируем историю сообщений
-            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+            # Шаг 3: Формируем промпт с контекстом и системной инструкцией
+            prompt_with_context = self._system_preamble + build_rag_prompt(context, query)
             
-            # Добавляем историю разговора
-            if history:
-                # Ограничиваем историю
-                max_history_items = 10 * 2  # 10 пар вопрос-ответ
-                recent_history = history[-max_history_items:] if len(history) > max_history_items else history
-                messages.extend(recent_history)
-                logger.info(f"Добавлено {len(recent_history)} сообщений из истории")
+            # Шаг 4: История сессии уже ограничена по длине и в формате Yandex API
+            messages = list(session.history)
+            if messages:
+                logger.info(f"Добавлено {len(messages)} сообщений из истории")
             
             # Добавляем текущий вопрос с RAG контекстом
-            messages.append({"role": "user", "content": prompt_with_context})
+            messages.append({"role": "user", "text": prompt_with_context})
             
             # Шаг 5: Генерируем ответ через Yandex GPT
             logger.info(f"Генерация ответа через Yandex GPT (всего сообщений: {len(messages)})")
             
-            answer = self.llm.generate_completion(
-                messages=messages,
+            answer = self.llm.complete(
+                messages,
                 temperature=0.7,
                 max_tokens=1000
             )
             
             logger.info(f"Ответ сгенерирован, длина: {len(answer)} символов")
             
+            # Сохраняем в историю ЧИСТЫЕ вопрос и ответ (без RAG промпта)
+            session.add_exchange(query, answer)
+            
             # Возвращаем результат
             return {
                 "answer": answer,
@@ -188,11 +204,21 @@ class RAGPipeline:
         try:
             # Шаг 1: Создаем эмбеддинги через Yandex
             logger.info("Создание эмбеддингов через Yandex API...")
-            embeddings = self.embedder.embed_texts(documents)
+            # Отправляем документы в порядке убывания длины: параллельные потоки
+            # получают задачи близкого размера, а самые долгие запросы стартуют
+            # первыми и не растягивают хвост индексации
+            order = sorted(range(len(documents)), key=lambda i: len(documents[i]), reverse=True)
+            sorted_embeddings = self.embedder.embed_texts([documents[i] for i in order])
+            
+            # Возвращаем эмбеддинги в исходный порядок документов (и источников)
+            embeddings = np.empty_like(sorted_embeddings)
+            embeddings[order] = sorted_embeddings
             
             # Шаг 2: Создаем новый индекс с правильной размерностью
-            dimension = self.embedder.get_embedding_dimension()
-            self.vectorstore.create_index(dimension)
+            # Эмбеддинги L2-нормализованы, а индекс ищет по скалярному произведению
+            # (косинусное сходство); для больших баз выбирается HNSW
+            dimension = embeddings.shape[1]
+            self.vectorstore.create_index(dimension, num_vectors=len(documents))
             
             # Шаг 3: Добавляем документы в индекс
             self.vectorstore.add_documents(documents, embeddings, sources)
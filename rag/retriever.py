@@ -6,7 +6,8 @@ Retriever (извлекатель) - компонент RAG-системы, ко
 """
 
 import logging
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import numpy as np
 from rag.yandex_embedder import YandexEmbedder
 from rag.vectorstore import FAISSVectorStore
 from config import TOP_K_RESULTS
@@ -38,22 +39,25 @@ class DocumentRetriever:
         self.vectorstore = vectorstore
         logger.info("DocumentRetriever инициализирован")
     
-    def retrieve(self, query: str, top_k: int = TOP_K_RESULTS) -> List[Tuple[str, str, float]]:
+    def retrieve(self, query: str, top_k: int = TOP_K_RESULTS,
+                 query_embedding: Optional[np.ndarray] = None) -> List[Tuple[str, str, float]]:
         """
         Извлекает наиболее релевантные документы для запроса.
         
         Args:
             query: Текстовый запрос пользователя
             top_k: Количество документов для извлечения
+            query_embedding: Готовый эмбеддинг запроса (если уже вычислен)
             
         Returns:
             Список кортежей (текст документа, источник, score релевантности)
         """
         logger.info(f"Поиск документов для запроса: '{query[:50]}...'")
         
-        # Шаг 1: Преобразуем запрос в вектор
-        query_embedding = self.embedder.embed_text(query)
-        logger.debug(f"Эмбеддинг запроса создан, размерность: {len(query_embedding)}")
+        # Шаг 1: Преобразуем запрос в вектор (если он не передан)
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_query(query)
+            logger.debug(f"Эмбеддинг запроса создан, размерность: {len(query_embedding)}")
         
         # Шаг 2: Ищем похожие документы в FAISS
         results = self.vectorstore.search(query_embedding, k=top_k)
@@ -62,13 +66,14 @@ class DocumentRetriever:
         logger.info(f"Найдено {len(results)} релевантных документов")
         for i, (text, source, distance) in enumerate(results):
             logger.debug(f"Документ {i+1}: источник={source}, "
-                        f"расстояние={distance:.4f}, "
+                        f"score={distance:.4f}, "
                         f"длина={len(text)} символов")
         
         return results
     
     def retrieve_context(self, query: str, top_k: int = TOP_K_RESULTS, 
-                        max_length: int = 3000) -> str:
+                        max_length: int = 3000,
+                        query_embedding: Optional[np.ndarray] = None) -> str:
         """
         Извлекает релевантные документы и объединяет их в единый контекст.
         
@@ -79,13 +84,65 @@ class DocumentRetriever:
             query: Текстовый запрос пользователя
             top_k: Количество документов для извлечения
             max_length: Максимальная длина контекста в символах
+            query_embedding: Готовый эмбеддинг запроса (если уже вычислен)
             
         Returns:
             Объединенный текст релевантных документов
         """
         # Получаем релевантные документы
-        results = self.retrieve(query, top_k)
+        results = self.retrieve(query, top_k, query_embedding=query_embedding)
+        return self._build_context(results, max_length)
+    
+    def get_relevant_sources(self, query: str, top_k: int = TOP_K_RESULTS,
+                             query_embedding: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Возвращает список источников релевантных документов.
+        
+        Полезно для отображения пользователю, откуда была взята информация.
+        
+        Args:
+            query: Текстовый запрос пользователя
+            top_k: Количество документов для анализа
+            query_embedding: Готовый эмбеддинг запроса (если уже вычислен)
+            
+        Returns:
+            Список уникальных источников (имен файлов)
+        """
+        results = self.retrieve(query, top_k, query_embedding=query_embedding)
+        return self._extract_sources(results)
+    
+    def retrieve_with_sources(self, query: str, top_k: int = TOP_K_RESULTS,
+                              max_length: int = 3000,
+                              query_embedding: Optional[np.ndarray] = None) -> Tuple[str, List[str]]:
+        """
+        Извлекает контекст и список источников за один проход.
+        
+        Запрос преобразуется в эмбеддинг и ищется в FAISS один раз,
+        а контекст и источники строятся из одного и того же набора результатов.
         
+        Args:
+            query: Текстовый запрос пользователя
+            top_k: Количество документов для извлечения
+            max_length: Максимальная длина контекста в символах
+            query_embedding: Готовый эмбеддинг запроса (если уже вычислен)
+            
+        Returns:
+            Кортеж (объединенный контекст, список уникальных источников)
+        """
+        results = self.retrieve(query, top_k, query_embedding=query_embedding)
+        return self._build_context(results, max_length), self._extract_sources(results)
+    
+    def _build_context(self, results: List[Tuple[str, str, float]], max_length: int) -> str:
+        """
+        Объединяет найденные документы в контекст для языковой модели.
+        
+        Args:
+            results: Результаты поиска (текст, источник, score)
+            max_length: Максимальная длина контекста в символах
+            
+        Returns:
+            Объединенный текст релевантных документов
+        """
         if not results:
             logger.warning("Релевантные документы не найдены")
             return "Релевантная информация не найдена в базе знаний."
@@ -95,18 +152,18 @@ class DocumentRetriever:
         total_length = 0
         
         for i, (text, source, distance) in enumerate(results, 1):
-            # Добавляем документ с заголовком
-            doc_text = f"[Документ {i} из {source}]\n{text}\n"
+            remaining = max_length - total_length
+            header = f"[Документ {i} из {source}]\n"
             
-            # Проверяем, не превышает ли длина лимит
-            if total_length + len(doc_text) > max_length:
-                # Если превышает, обрезаем текст
-                remaining = max_length - total_length
+            # Проверяем длину до склейки строк, чтобы не собирать
+            # полный текст документа, который все равно будет обрезан
+            if len(header) + len(text) + 1 > remaining:
                 if remaining > 100:  # Добавляем только если есть смысл
-                    doc_text = doc_text[:remaining] + "...\n"
-                    context_parts.append(doc_text)
+                    body = text[:max(remaining - len(header), 0)]
+                    context_parts.append((header + body)[:remaining] + "...\n")
                 break
             
+            doc_text = f"{header}{text}\n"
             context_parts.append(doc_text)
             total_length += len(doc_text)
         
@@ -115,23 +172,12 @@ class DocumentRetriever:
         
         return context
     
-    def get_relevant_sources(self, query: str, top_k: int = TOP_K_RESULTS) -> List[str]:
+    def _extract_sources(self, results: List[Tuple[str, str, float]]) -> List[str]:
         """
-        Возвращает список источников релевантных документов.
-        
-        Полезно для отображения пользователю, откуда была взята информация.
-        
-        Args:
-            query: Текстовый запрос пользователя
-            top_k: Количество документов для анализа
-            
-        Returns:
-            Список уникальных источников (имен файлов)
+        Возвращает уникальные источники из результатов поиска
+        в порядке убывания релевантности.
         """
-        results = self.retrieve(query, top_k)
-        
-        # Извлекаем уникальные источники
-        sources = list(set(source for _, source, _ in results))
+        sources = list(dict.fromkeys(source for _, source, _ in results))
         logger.debug(f"Найдено источников: {sources}")
         
         return sources
@@ -0,0 +1,65 @@
+"""
+Модуль с состоянием диалога пользователя для RAG-пайплайна.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List
+from config import MAX_HISTORY_LENGTH
+from rag.yandex_gpt import to_yandex_messages
+
+
+def _new_history() -> Deque[Dict[str, str]]:
+    """
+    Создает очередь истории на MAX_HISTORY_LENGTH пар вопрос-ответ.
+    """
+    return deque(maxlen=MAX_HISTORY_LENGTH * 2)
+
+
+@dataclass
+class ChatSession:
+    """
+    История диалога одного пользователя.
+    
+    Сообщения хранятся сразу в формате Yandex API ({"role": ..., "text": ...})
+    в очереди фиксированной длины: старые сообщения вытесняются при добавлении
+    новых, поэтому историю не нужно обрезать и преобразовывать на каждом запросе.
+    """
+    
+    history: Deque[Dict[str, str]] = field(default_factory=_new_history)
+    
+    @classmethod
+    def from_messages(cls, messages: List[Dict[str, str]]) -> "ChatSession":
+        """
+        Создает сессию из истории в формате [{"role": ..., "content": ...}].
+        
+        Args:
+            messages: Сообщения в формате OpenAI (роль "system" преобразуется
+                так же, как в YandexGPT.generate_completion)
+        
+        Returns:
+            Сессия с последними MAX_HISTORY_LENGTH парами сообщений
+        """
+        session = cls()
+        session.history.extend(to_yandex_messages(messages))
+        return session
+    
+    def add_exchange(self, query: str, answer: str):
+        """
+        Добавляет в историю пару вопрос-ответ.
+        
+        Args:
+            query: Вопрос пользователя (без RAG-контекста)
+            answer: Ответ модели
+        """
+        self.history.append({"role": "user", "text": query})
+        self.history.append({"role": "assistant", "text": answer})
+    
+    def clear(self):
+        """
+        Очищает историю диалога.
+        """
+        self.history.clear()
+    
+    def __len__(self) -> int:
+        return len(self.history)
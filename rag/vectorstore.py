@@ -12,7 +12,16 @@ from pathlib import Path
 from typing import List, Tuple
 import numpy as np
 import faiss
-from config import FAISS_INDEX_PATH, FAISS_METADATA_PATH
+from config import (
+    FAISS_INDEX_PATH,
+    FAISS_METADATA_PATH,
+    HNSW_THRESHOLD,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    INDEX_USE_SQ8,
+    SQ8_THRESHOLD,
+)
 
 # Настраиваем логирование
 logger = logging.getLogger(__name__)
@@ -45,41 +54,68 @@ class FAISSVectorStore:
         logger.info(f"Путь к индексу: {self.index_path}")
         logger.info(f"Путь к метаданным: {self.metadata_path}")
     
-    def create_index(self, dimension: int):
+    def create_index(self, dimension: int, num_vectors: int = 0):
         """
         Создает новый пустой FAISS индекс.
         
+        Для баз больше HNSW_THRESHOLD документов создается граф HNSW
+        (приближенный поиск за O(log N)), иначе - плоский индекс с полным
+        перебором. При INDEX_USE_SQ8 для баз больше SQ8_THRESHOLD векторы
+        хранятся квантованными в int8; такой индекс обучается на первой
+        порции векторов в add_documents().
+        
         Args:
             dimension: Размерность векторов эмбеддингов (например, 256 для Yandex)
+            num_vectors: Ожидаемое количество векторов в индексе
         """
-        # IndexFlatL2 - простой индекс с L2 (евклидовой) метрикой расстояния
-        # Для больших баз можно использовать IndexIVFFlat или другие типы
-        self.index = faiss.IndexFlatL2(dimension)
+        # Во всех вариантах метрика - скалярное произведение. Эмбеддеры возвращают
+        # L2-нормализованные векторы, поэтому это косинусное сходство
+        metric = faiss.METRIC_INNER_PRODUCT
+        qtype = faiss.ScalarQuantizer.QT_8bit
+        use_sq8 = INDEX_USE_SQ8 and num_vectors > SQ8_THRESHOLD
+        if num_vectors > HNSW_THRESHOLD:
+            if use_sq8:
+                self.index = faiss.IndexHNSWSQ(dimension, qtype, HNSW_M, metric)
+            else:
+                self.index = faiss.IndexHNSWFlat(dimension, HNSW_M, metric)
+            self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            self.index.hnsw.efSearch = HNSW_EF_SEARCH
+        elif use_sq8:
+            self.index = faiss.IndexScalarQuantizer(dimension, qtype, metric)
+        else:
+            # IndexFlatIP - точный поиск полным перебором
+            self.index = faiss.IndexFlatIP(dimension)
         self.metadata = []
-        logger.info(f"Создан новый FAISS индекс с размерностью {dimension}")
+        logger.info(f"Создан новый FAISS индекс {type(self.index).__name__} "
+                    f"с размерностью {dimension}")
     
-    def add_documents(self, texts: List[str], embeddings: List[List[float]], 
+    def add_documents(self, texts: List[str], embeddings: np.ndarray, 
                      sources: List[str] = None):
         """
         Добавляет документы в векторное хранилище.
         
         Args:
             texts: Список текстов документов
-            embeddings: Список векторов эмбеддингов для этих текстов
+            embeddings: Матрица эмбеддингов (N, D) float32 для этих текстов
             sources: Список источников (имена файлов) для каждого документа
         """
         if self.index is None:
             raise ValueError("Индекс не инициализирован. Сначала вызовите create_index().")
         
-        if not texts or not embeddings:
+        if not texts or len(embeddings) == 0:
             logger.warning("Попытка добавить пустой список документов")
             return
         
         if len(texts) != len(embeddings):
             raise ValueError("Количество текстов и эмбеддингов должно совпадать")
         
-        # Преобразуем эмбеддинги в numpy массив (требуется для FAISS)
-        embeddings_array = np.array(embeddings, dtype=np.float32)
+        # FAISS требует непрерывный float32-массив; для готовой матрицы копии не будет
+        embeddings_array = np.ascontiguousarray(embeddings, dtype=np.float32)
+        
+        # Квантованный индекс нужно обучить (диапазоны значений по измерениям)
+        if not self.index.is_trained:
+            self.index.train(embeddings_array)
+            logger.info(f"FAISS индекс обучен на {len(embeddings_array)} векторах")
         
         # Добавляем векторы в FAISS индекс
         self.index.add(embeddings_array)
@@ -96,7 +132,7 @@ class FAISSVectorStore:
         logger.info(f"Добавлено {len(texts)} документов в векторное хранилище")
         logger.info(f"Всего документов в хранилище: {len(self.metadata)}")
     
-    def search(self, query_embedding: List[float], k: int = 3) -> List[Tuple[str, str, float]]:
+    def search(self, query_embedding: np.ndarray, k: int = 3) -> List[Tuple[str, str, float]]:
         """
         Ищет наиболее похожие документы по запросу.
         
@@ -105,7 +141,7 @@ class FAISSVectorStore:
             k: Количество наиболее похожих документов для возврата
             
         Returns:
-            Список кортежей (текст документа, источник, расстояние/релевантность)
+            Список кортежей (текст документа, источник, score релевантности)
             Отсортирован по убыванию релевантности
         """
         if self.index is None or self.index.ntotal == 0:
@@ -113,16 +149,16 @@ class FAISSVectorStore:
             return []
         
         # Преобразуем запрос в numpy массив нужной формы
-        query_array = np.array([query_embedding], dtype=np.float32)
+        query_array = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1)
         
         # Выполняем поиск k ближайших соседей
-        # distances - расстояния до найденных векторов (чем меньше, тем лучше)
+        # distances - косинусное сходство с найденными векторами (чем больше, тем лучше)
         # indices - индексы найденных векторов в хранилище
         distances, indices = self.index.search(query_array, min(k, self.index.ntotal))
         
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):  # Проверяем корректность индекса
+            if 0 <= idx < len(self.metadata):  # HNSW может вернуть -1, если соседей меньше k
                 metadata = self.metadata[idx]
                 distance = float(distances[0][i])
                 results.append((metadata["text"], metadata["source"], distance))
@@ -195,7 +231,20 @@ class FAISSVectorStore:
         try:
             # Загружаем FAISS индекс
             self.index = faiss.read_index(str(self.index_path))
-            logger.info(f"FAISS индекс загружен из {self.index_path}")
+            
+            # Запросы L2-нормализуются, а score читается как косинусное сходство,
+            # поэтому индекс со старой метрикой (IndexFlatL2) дал бы неверный порядок
+            if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+                logger.warning(f"Индекс {self.index_path} создан с устаревшей метрикой "
+                               f"(не скалярное произведение). Пересоздайте индекс командой /ingest.")
+                self.index = None
+                return False
+            
+            # Тип индекса хранится в самом файле; для HNSW восстанавливаем
+            # параметры поиска из текущей конфигурации
+            if isinstance(self.index, faiss.IndexHNSW):
+                self.index.hnsw.efSearch = HNSW_EF_SEARCH
+            logger.info(f"FAISS индекс {type(self.index).__name__} загружен из {self.index_path}")
             logger.info(f"Количество векторов в индексе: {self.index.ntotal}")
             
             # Загружаем метаданные
@@ -221,6 +270,7 @@ class FAISSVectorStore:
             "total_vectors": self.index.ntotal if self.index else 0,
             "total_documents": len(self.metadata),
             "dimension": self.index.d if self.index else 0,
+            "index_type": type(self.index).__name__ if self.index else None,
             "index_exists": self.index_path.exists(),
             "metadata_exists": self.metadata_path.exists()
         }
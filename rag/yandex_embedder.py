@@ -2,14 +2,35 @@
 Модуль для создания эмбеддингов через Yandex API.
 """
 
+import hashlib
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 from typing import List
 import requests
 import numpy as np
-from config import YANDEX_API_KEY, YANDEX_FOLDER_ID, YANDEX_EMBED_MODEL, REQUEST_TIMEOUT
+from rag.yandex_http import create_session, indexing_retry, check_response, parse_json
+from config import (
+    YANDEX_API_KEY,
+    YANDEX_FOLDER_ID,
+    YANDEX_EMBED_MODEL,
+    REQUEST_TIMEOUT,
+    EMBED_MAX_WORKERS,
+    EMBEDDINGS_CACHE_DIR,
+    QUERY_CACHE_SIZE,
+    EMBED_MAX_TEXT_LENGTH,
+    EMBED_CHUNK_SIZE,
+    EMBED_CHUNK_OVERLAP,
+)
 
 logger = logging.getLogger(__name__)
 
+# Общий экземпляр эмбеддера (см. get_embedder)
+_default_embedder = None
+
 class YandexEmbedder:
     """
     Класс для создания эмбеддингов текста с использованием Yandex API.
@@ -38,30 +59,167 @@ class YandexEmbedder:
             "x-folder-id": self.folder_id
         }
         
+        # Общая HTTP-сессия: соединения переиспользуются между запросами и потоками
+        self.max_workers = EMBED_MAX_WORKERS
+        self.session = create_session(self.headers, indexing_retry(),
+                                      pool_connections=self.max_workers,
+                                      pool_maxsize=self.max_workers * 2)
+        
+        # Постоянный кэш эмбеддингов на диске (ключ - SHA-256 от модели и текста).
+        # В памяти векторы документов не держим: они нужны только при индексации
+        self._cache_dir = Path(EMBEDDINGS_CACHE_DIR)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # LRU-кэш эмбеддингов запросов (на экземпляр, чтобы не держать self в
+        # глобальном кэше функции)
+        self._embed_query_cached = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._embed_query_uncached)
+        
         # Размерность эмбеддингов для Yandex text-search-doc
         self._dimension = 256  # Yandex возвращает 256-мерные векторы
         
         logger.info(f"YandexEmbedder инициализирован с моделью: {self.model}")
         logger.info(f"Model URI: {self.model_uri}")
         logger.info(f"Предполагаемая размерность: {self._dimension}")
+        logger.info(f"Кэш эмбеддингов: {self._cache_dir}")
+    
+    def _cache_key(self, text: str) -> str:
+        """
+        Вычисляет ключ кэша для текста.
+        
+        В ключ входит URI модели, чтобы смена модели не возвращала чужие векторы.
+        """
+        return hashlib.sha256(f"{self.model_uri}\n{text}".encode("utf-8")).hexdigest()
+    
+    def _cache_path(self, key: str) -> Path:
+        """
+        Возвращает путь к файлу кэша вида {key[:2]}/{key}.npy.
+        """
+        return self._cache_dir / key[:2] / f"{key}.npy"
+    
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """
+        L2-нормализует вектор, чтобы скалярное произведение в FAISS
+        (IndexFlatIP) было косинусным сходством.
+        """
+        norm = np.linalg.norm(embedding)
+        return embedding / max(norm, 1e-12)
+    
+    def _load_cached(self, key: str):
+        """
+        Ищет эмбеддинг в кэше на диске.
+        
+        Returns:
+            Вектор эмбеддинга или None, если в кэше его нет
+        """
+        path = self._cache_path(key)
+        if not path.exists():
+            return None
+        
+        try:
+            # В кэш пишутся уже нормализованные float32-векторы
+            embedding = np.load(path)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать кэш эмбеддинга {path}: {e}")
+            return None
+        
+        return embedding
+    
+    def _store_cached(self, key: str, embedding: np.ndarray):
+        """
+        Сохраняет эмбеддинг в кэш на диске (float32, формат .npy).
+        """
+        path = self._cache_path(key)
+        # Пишем во временный файл и атомарно переименовываем,
+        # чтобы параллельные потоки не видели недописанный файл
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, embedding)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить эмбеддинг в кэш {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+    
+    def _split_text(self, text: str) -> List[str]:
+        """
+        Разбивает длинный текст на перекрывающиеся фрагменты.
+        
+        Тексты не длиннее EMBED_MAX_TEXT_LENGTH возвращаются как есть.
+        Последний фрагмент не начинается внутри перекрытия предыдущего,
+        чтобы не получать фрагменты, целиком вложенные в соседний.
+        
+        Args:
+            text: Исходный текст
+            
+        Returns:
+            Список фрагментов текста
+        """
+        if len(text) <= EMBED_MAX_TEXT_LENGTH:
+            return [text]
+        
+        step = EMBED_CHUNK_SIZE - EMBED_CHUNK_OVERLAP
+        return [text[i:i + EMBED_CHUNK_SIZE]
+                for i in range(0, len(text) - EMBED_CHUNK_OVERLAP, step)]
     
-    def embed_text(self, text: str) -> List[float]:
+    def _pool_chunks(self, vectors: List[np.ndarray]) -> np.ndarray:
+        """
+        Объединяет эмбеддинги фрагментов одного текста в один вектор
+        (среднее с повторной L2-нормализацией).
+        """
+        if len(vectors) == 1:
+            return vectors[0]
+        return self._normalize(np.mean(vectors, axis=0).astype(np.float32, copy=False))
+    
+    def embed_text(self, text: str, use_cache: bool = True) -> np.ndarray:
         """
         Создает эмбеддинг (векторное представление) для одного текста.
         
+        Тексты длиннее EMBED_MAX_TEXT_LENGTH (лимит Yandex API) не обрезаются,
+        а разбиваются на перекрывающиеся фрагменты; итоговый вектор - среднее
+        эмбеддингов фрагментов.
+        
+        Args:
+            text: Текст для преобразования в вектор
+            use_cache: Использовать ли постоянный кэш эмбеддингов документов
+            
+        Returns:
+            L2-нормализованный вектор эмбеддинга (np.ndarray формы (D,), dtype float32)
+        """
+        chunks = self._split_text(text)
+        if len(chunks) > 1:
+            logger.info(f"Текст длиной {len(text)} символов разбит на {len(chunks)} фрагментов")
+        return self._pool_chunks([self._embed_chunk(chunk, use_cache) for chunk in chunks])
+    
+    def _embed_chunk(self, text: str, use_cache: bool = True) -> np.ndarray:
+        """
+        Создает эмбеддинг для текста, укладывающегося в лимит Yandex API.
+        
         Args:
             text: Текст для преобразования в вектор
+            use_cache: Использовать ли постоянный кэш эмбеддингов документов
             
         Returns:
-            Список чисел с плавающей точкой - вектор эмбеддинга
+            L2-нормализованный вектор эмбеддинга (np.ndarray формы (D,), dtype float32)
         """
+        # Проверяем уровень один раз, чтобы не форматировать f-строки
+        # отладочных сообщений, когда DEBUG выключен
+        debug = logger.isEnabledFor(logging.DEBUG)
+        
         try:
-            # Обрезаем слишком длинные тексты (лимит Yandex API)
-            if len(text) > 10000:
-                text = text[:10000]
-                logger.warning(f"Текст обрезан до 10000 символов")
+            # Проверяем кэш перед обращением к API
+            key = self._cache_key(text)
+            cached = self._load_cached(key) if use_cache else None
+            if cached is not None:
+                if debug:
+                    logger.debug(f"Эмбеддинг найден в кэше: {key[:12]}")
+                if len(cached) != self._dimension:
+                    self._dimension = len(cached)
+                return cached
             
-            logger.debug(f"Создание эмбеддинга для текста длиной {len(text)} символов")
+            if debug:
+                logger.debug(f"Создание эмбеддинга для текста длиной {len(text)} символов")
             
             # Формируем запрос
             payload = {
@@ -70,25 +228,27 @@ class YandexEmbedder:
             }
             
             # Отправляем запрос
-            response = requests.post(
+            response = self.session.post(
                 self.url,
-                headers=self.headers,
                 json=payload,
                 timeout=REQUEST_TIMEOUT
             )
             
             # Проверяем ответ
-            response.raise_for_status()
-            data = response.json()
+            check_response(response)
+            data = parse_json(response.content)
             
             # Извлекаем вектор
             if "embedding" in data:
-                embedding = data["embedding"]
+                embedding = self._normalize(np.asarray(data["embedding"], dtype=np.float32))
                 # Обновляем размерность на основе реального ответа
                 if len(embedding) != self._dimension:
                     self._dimension = len(embedding)
                     logger.info(f"Обновлена размерность эмбеддингов: {self._dimension}")
-                logger.debug(f"Эмбеддинг создан, размерность: {len(embedding)}")
+                if debug:
+                    logger.debug(f"Эмбеддинг создан, размерность: {len(embedding)}")
+                if use_cache:
+                    self._store_cached(key, embedding)
                 return embedding
             else:
                 logger.error(f"Неожиданный формат ответа: {data}")
@@ -101,26 +261,74 @@ class YandexEmbedder:
             logger.error(f"Ошибка при создании эмбеддинга: {e}")
             raise
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def _embed_query_uncached(self, normalized_query: str) -> np.ndarray:
+        """
+        Запрашивает эмбеддинг запроса у API (обертка для LRU-кэша).
+        
+        Массив помечается как только для чтения, чтобы закэшированное
+        значение нельзя было случайно изменить.
+        """
+        embedding = self.embed_text(normalized_query, use_cache=False)
+        embedding.setflags(write=False)
+        return embedding
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Создает эмбеддинг для поискового запроса пользователя.
+        
+        Запрос нормализуется (обрезка пробелов, нижний регистр), а результат
+        кэшируется в памяти (LRU), поэтому повторные вопросы не требуют
+        обращения к API. Запросы не попадают в постоянный кэш документов.
+        
+        Args:
+            query: Текст запроса
+            
+        Returns:
+            Вектор эмбеддинга запроса (только для чтения)
+        """
+        normalized_query = query.strip().lower()
+        return self._embed_query_cached(normalized_query)
+    
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """
         Создает эмбеддинги для нескольких текстов.
         
+        Запросы выполняются параллельно (не более EMBED_MAX_WORKERS одновременно),
+        порядок результатов совпадает с порядком входных текстов. Фрагменты
+        длинных текстов (см. embed_text) отправляются в тот же пул потоков.
+        
         Args:
             texts: Список текстов для преобразования
             
         Returns:
-            Список векторов эмбеддингов
+            Матрица эмбеддингов формы (N, D), dtype float32
         """
         try:
             logger.info(f"Создание эмбеддингов для {len(texts)} текстов")
             
-            embeddings = []
-            for i, text in enumerate(texts, 1):
-                logger.debug(f"Обработка текста {i}/{len(texts)} (длина: {len(text)} символов)")
-                
-                # Обрабатываем каждый текст отдельно
-                embedding = self.embed_text(text)
-                embeddings.append(embedding)
+            # Yandex API принимает один текст на запрос, поэтому
+            # распараллеливаем запросы; map сохраняет порядок входных текстов
+            text_chunks = [self._split_text(text) for text in texts]
+            chunks = [chunk for parts in text_chunks for chunk in parts]
+            
+            # Прогресс логируем примерно каждый 1%, а не для каждого текста
+            total = len(chunks)
+            report_every = max(1, total // 100)
+            
+            vectors = []
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for i, vector in enumerate(executor.map(self._embed_chunk, chunks), 1):
+                    vectors.append(vector)
+                    if i % report_every == 0 and i < total:
+                        logger.info(f"Создано эмбеддингов: {i}/{total}")
+            
+            # Собираем результат сразу в непрерывную float32-матрицу для FAISS,
+            # усредняя фрагменты длинных текстов
+            embeddings = np.empty((len(texts), self._dimension), dtype=np.float32)
+            start = 0
+            for i, parts in enumerate(text_chunks):
+                embeddings[i] = self._pool_chunks(vectors[start:start + len(parts)])
+                start += len(parts)
             
             logger.info(f"Успешно создано {len(embeddings)} эмбеддингов")
             return embeddings
@@ -146,7 +354,7 @@ class YandexEmbedder:
             True если соединение успешно
         """
         try:
-            test_embedding = self.embed_text("test")
+            test_embedding = self.embed_text("test", use_cache=False)
             if len(test_embedding) == self._dimension:
                 logger.info(f"Соединение с Yandex Embeddings API успешно, размерность: {len(test_embedding)}")
                 return True
@@ -157,3 +365,18 @@ class YandexEmbedder:
             logger.error(f"Ошибка тестирования соединения: {e}")
             return False
 
+
+def get_embedder() -> YandexEmbedder:
+    """
+    Возвращает общий экземпляр YandexEmbedder, создавая его при первом вызове.
+    
+    Повторное использование сохраняет прогретый пул HTTP-соединений
+    и кэши эмбеддингов между пайплайнами.
+    
+    Returns:
+        Экземпляр YandexEmbedder
+    """
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = YandexEmbedder()
+    return _default_embedder
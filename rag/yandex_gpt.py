@@ -5,10 +5,35 @@
 import logging
 from typing import List, Dict
 import requests
+from rag.yandex_http import create_session, interactive_retry, check_response, parse_json
 from config import YANDEX_API_KEY, YANDEX_FOLDER_ID, YANDEX_GPT_MODEL, REQUEST_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
+# Общий экземпляр клиента (см. get_llm)
+_default_llm = None
+
+def to_yandex_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Преобразует сообщения [{"role": ..., "content": ...}] в формат Yandex API.
+    
+    Системная роль Yandex GPT не поддерживается, поэтому такие сообщения
+    отправляются как пользовательские с пометкой "Системная инструкция:".
+    
+    Args:
+        messages: Сообщения в формате OpenAI
+        
+    Returns:
+        Сообщения в формате [{"role": ..., "text": ...}]
+    """
+    return [
+        {"role": "user", "text": f"Системная инструкция: {m['content']}"}
+        if m["role"] == "system"
+        else {"role": m["role"], "text": m["content"]}
+        for m in messages
+    ]
+
+
 class YandexGPT:
     """
     Класс для взаимодействия с Yandex GPT API.
@@ -36,6 +61,10 @@ class YandexGPT:
             "x-folder-id": self.folder_id
         }
         
+        # Постоянная HTTP-сессия с keep-alive и коротким бюджетом повторов:
+        # запрос выполняется, пока пользователь ждет ответа
+        self.session = create_session(self.headers, interactive_retry())
+        
         logger.info(f"YandexGPT инициализирован с моделью: {YANDEX_GPT_MODEL}")
         logger.info(f"Model URI: {self.model_uri}")
     
@@ -46,30 +75,33 @@ class YandexGPT:
         Генерирует ответ на основе истории сообщений.
         
         Args:
-            messages: Список сообщений в формате [{"role": "user", "content": "текст"}]
+            messages: Список сообщений в формате [{"role": "user", "content": "текст"}].
+                Сообщения с ролью "system" передаются как пользовательские
+                с префиксом "Системная инструкция:"
             temperature: Креативность ответа (0.0-1.0)
             max_tokens: Максимальное количество токенов в ответе
             
         Returns:
             Текст ответа от модели
         """
-        try:
-            # Преобразуем сообщения в формат Yandex API
-            yandex_messages = []
-            for msg in messages:
-                # Yandex API не поддерживает системные сообщения напрямую
-                # Добавляем системный промпт как первое пользовательское сообщение
-                if msg["role"] == "system":
-                    yandex_messages.append({
-                        "role": "user",
-                        "text": f"Системная инструкция: {msg['content']}"
-                    })
-                else:
-                    yandex_messages.append({
-                        "role": msg["role"],
-                        "text": msg["content"]
-                    })
+        yandex_messages = to_yandex_messages(messages)
+        return self.complete(yandex_messages, temperature=temperature, max_tokens=max_tokens)
+    
+    def complete(self, yandex_messages: List[Dict[str, str]],
+                 temperature: float = 0.7,
+                 max_tokens: int = 1000) -> str:
+        """
+        Генерирует ответ по сообщениям, уже приведенным к формату Yandex API.
+        
+        Args:
+            yandex_messages: Список сообщений в формате [{"role": "user", "text": "текст"}]
+            temperature: Креативность ответа (0.0-1.0)
+            max_tokens: Максимальное количество токенов в ответе
             
+        Returns:
+            Текст ответа от модели
+        """
+        try:
             # Формируем запрос
             payload = {
                 "modelUri": self.model_uri,
@@ -83,16 +115,15 @@ class YandexGPT:
             logger.debug(f"Отправка запроса к Yandex GPT: {payload}")
             
             # Отправляем запрос
-            response = requests.post(
+            response = self.session.post(
                 self.url,
-                headers=self.headers,
                 json=payload,
                 timeout=REQUEST_TIMEOUT
             )
             
             # Проверяем ответ
-            response.raise_for_status()
-            data = response.json()
+            check_response(response)
+            data = parse_json(response.content)
             
             # Извлекаем текст ответа
             if "result" in data and "alternatives" in data["result"]:
@@ -133,3 +164,17 @@ class YandexGPT:
             "error": "Vision API не настроен"
         }
 
+
+def get_llm() -> YandexGPT:
+    """
+    Возвращает общий экземпляр YandexGPT, создавая его при первом вызове.
+    
+    Повторное использование сохраняет прогретый пул HTTP-соединений.
+    
+    Returns:
+        Экземпляр YandexGPT
+    """
+    global _default_llm
+    if _default_llm is None:
+        _default_llm = YandexGPT()
+    return _default_llm
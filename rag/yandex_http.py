@@ -0,0 +1,170 @@
+"""
+Модуль с общими настройками HTTP для клиентов Yandex API.
+"""
+
+from typing import Any, Dict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_BACKOFF_JITTER,
+    GPT_MAX_RETRIES,
+    GPT_BACKOFF_MAX,
+    GPT_RETRY_AFTER_MAX,
+)
+
+# orjson заметно быстрее разбирает ответы с массивами чисел (эмбеддинги),
+# но остается необязательной зависимостью
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+# Коды ответа, при которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class YandexAPIError(requests.exceptions.HTTPError):
+    """
+    Ошибка ответа Yandex API (код ответа, отличный от 200).
+    
+    Хранит код ответа и тело, чтобы вызывающий код мог отличить
+    превышение лимитов (429) от ошибок сервера.
+    """
+    
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Yandex API вернул {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+    
+    @property
+    def is_retryable(self) -> bool:
+        """
+        True, если запрос имеет смысл повторить позже.
+        """
+        return self.status_code in RETRY_STATUS_CODES
+
+
+def check_response(response: requests.Response):
+    """
+    Проверяет код ответа Yandex API.
+    
+    Args:
+        response: Ответ requests
+        
+    Raises:
+        YandexAPIError: Если код ответа отличен от 200
+    """
+    if response.status_code != 200:
+        raise YandexAPIError(response.status_code, response.text)
+
+
+def parse_json(content: bytes) -> Any:
+    """
+    Разбирает тело ответа Yandex API из байтов.
+    
+    Args:
+        content: Тело ответа (response.content)
+        
+    Returns:
+        Разобранный JSON
+    """
+    return _loads(content)
+
+
+class _CappedRetryAfter(Retry):
+    """
+    Retry, который ограничивает учитываемое значение Retry-After
+    величиной GPT_RETRY_AFTER_MAX.
+    
+    Ограничение задано на уровне класса, потому что urllib3 пересоздает
+    объект Retry через Retry.new() и не переносит дополнительные аргументы.
+    """
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, GPT_RETRY_AFTER_MAX)
+
+
+def indexing_retry() -> Retry:
+    """
+    Политика повторов для массовых запросов (эмбеддинги при индексации).
+    
+    Повторяет запросы при временных ошибках сервера и превышении
+    лимитов (429) с экспоненциальной задержкой и случайным разбросом,
+    в том числе после таймаута чтения. Заголовок Retry-After имеет
+    приоритет над задержкой. Запросы эмбеддингов не меняют состояние,
+    поэтому POST тоже повторяется.
+    
+    Returns:
+        Настроенный объект Retry
+    """
+    return Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        # После исчерпания повторов возвращаем последний ответ, чтобы
+        # check_response выбросил YandexAPIError с кодом и телом ответа
+        raise_on_status=False
+    )
+
+
+def interactive_retry() -> Retry:
+    """
+    Политика повторов для интерактивных запросов (ответы Yandex GPT).
+    
+    Ответа ждет пользователь, поэтому повторов мало, задержка и Retry-After
+    ограничены, а после таймаута чтения запрос не повторяется: генерация
+    могла уже выполниться на сервере и быть оплаченной.
+    
+    Returns:
+        Настроенный объект Retry
+    """
+    return _CappedRetryAfter(
+        total=GPT_MAX_RETRIES,
+        read=0,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_JITTER,
+        backoff_max=GPT_BACKOFF_MAX,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["POST"]),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+def create_session(headers: Dict[str, str], retry: Retry,
+                   pool_connections: int = 16,
+                   pool_maxsize: int = 32) -> requests.Session:
+    """
+    Создает HTTP-сессию с keep-alive для запросов к Yandex API.
+    
+    Сессия переиспользует TCP/TLS-соединения между запросами
+    и повторяет запросы по переданной политике.
+    
+    Args:
+        headers: Заголовки, которые отправляются с каждым запросом
+        retry: Политика повторов (indexing_retry() или interactive_retry())
+        pool_connections: Количество пулов соединений
+        pool_maxsize: Максимальное количество соединений в пуле
+        
+    Returns:
+        Настроенная сессия requests
+    """
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=retry)
+    
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", adapter)
+    return session